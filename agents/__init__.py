@@ -1,13 +1,19 @@
+import functools
+from typing import Any
 from pydantic_ai import Agent
-from models import FinalVeoPrompt
+from pydantic_ai.models.gemini import GeminiModel
+from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from models import FinalVeoPrompt, EnrichedCharacters, ScenePromptBatch
 from config import Config
+from agents._http import SHARED_HTTP
 
-# Check if API keys are available
-google_key = Config.get_google_api_key()
-anthropic_key = Config.get_anthropic_api_key()
-
-# Single Master Agent Model
+# Model choice per agent (cost/quality tradeoff):
+# - master: gemini-2.5-flash. Writes the full structured vlog prompt, where quality matters most.
+# - string / character_batch: gemini-2.5-flash-lite. Rewriting a short character description into
+#   15-25 words is a narrow task; flash-lite is roughly half the per-token cost and latency with
+#   adequate quality.
 MASTER_PROMPT_AGENT_MODEL = "google-gla:gemini-2.5-flash"
+ENRICHMENT_AGENT_MODEL = "google-gla:gemini-2.5-flash-lite"
 
 # Master System Prompt that captures the essence of GREATLY_WORKED_PROMPTS.md
 MASTER_SYSTEM_PROMPT = """
@@ -84,28 +90,50 @@ REQUIREMENTS:
 - Keep the "Outdoor Boys" authentic vlog style
 """
 
-# Single Master Agent
-if google_key:
-    master_prompt_agent = Agent(
-        model=MASTER_PROMPT_AGENT_MODEL,
-        output_type=FinalVeoPrompt,
-        system_prompt=MASTER_SYSTEM_PROMPT
-    )
+# Batched Character Enhancement System Prompt
+CHARACTER_BATCH_ENHANCEMENT_PROMPT = """
+You are a character description enhancer for professional YouTube vlogs. Enhance every character you are given in one pass so the descriptions are consistent, detailed, and realistic.
+
+REQUIREMENTS:
+- Return exactly one entry per character, using the character name exactly as given
+- Make each description 15-25 words
+- Focus on visual details for video consistency
+- Maintain authentic, realistic style
+- No references to other scenes or characters
+- No quotes or extra text inside the descriptions
+- Keep the "Outdoor Boys" authentic vlog style
+"""
 
-    # Separate agent for string responses (character enhancement)
-    string_agent = Agent(
-        model=MASTER_PROMPT_AGENT_MODEL,
-        output_type=str,
-        system_prompt=CHARACTER_ENHANCEMENT_PROMPT
+# Model, output type and system prompt for each agent, keyed by the name passed to get_agent
+AGENT_SPECS = {
+    "master": (MASTER_PROMPT_AGENT_MODEL, FinalVeoPrompt, MASTER_SYSTEM_PROMPT),
+    # String responses (character enhancement)
+    "string": (ENRICHMENT_AGENT_MODEL, str, CHARACTER_ENHANCEMENT_PROMPT),
+    # Enhances all main characters in a single structured call
+    "character_batch": (ENRICHMENT_AGENT_MODEL, EnrichedCharacters, CHARACTER_BATCH_ENHANCEMENT_PROMPT),
+    # Writes every scene of a multi-scene series in a single structured call
+    "scene_batch": (MASTER_PROMPT_AGENT_MODEL, ScenePromptBatch, MASTER_SYSTEM_PROMPT),
+}
+
+def _build_model(model: str) -> GeminiModel:
+    """Create a Gemini model whose requests go through the shared HTTP client."""
+    provider = GoogleGLAProvider(api_key=Config.get_google_api_key(), http_client=SHARED_HTTP)
+    return GeminiModel(model.removeprefix("google-gla:"), provider=provider)
+
+@functools.lru_cache(maxsize=None)
+def get_agent(name: str) -> Agent[None, Any] | None:
+    """
+    Build the named agent on first use and reuse it afterwards.
+    Returns None when the Google API key is not set.
+    """
+    if name not in AGENT_SPECS:
+        raise ValueError(f"Unknown agent: {name}")
+    if not Config.get_google_api_key():
+        return None
+
+    model, output_type, system_prompt = AGENT_SPECS[name]
+    return Agent(
+        model=_build_model(model),
+        output_type=output_type,
+        system_prompt=system_prompt
     )
-else:
-    master_prompt_agent = None
-    string_agent = None
-
-# Legacy agents set to None (no longer needed)
-context_analysis_agent = None
-final_assembly_agent = None
-character_enrichment_agent = None
-camera_enrichment_agent = None
-sounds_enrichment_agent = None
-realism_filter_agent = None
\ No newline at end of file
@@ -0,0 +1,23 @@
+import asyncio
+import atexit
+import importlib.util
+
+import httpx
+
+# One connection pool for every agent, so keep-alive connections (and HTTP/2 multiplexing when
+# the optional h2 package is installed) are reused across agents and concurrent scene calls.
+SHARED_HTTP = httpx.AsyncClient(
+    http2=importlib.util.find_spec("h2") is not None,
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    timeout=httpx.Timeout(timeout=600, connect=5),
+)
+
+@atexit.register
+def _close_shared_http() -> None:
+    if SHARED_HTTP.is_closed:
+        return
+    try:
+        asyncio.run(SHARED_HTTP.aclose())
+    except RuntimeError:
+        # Connections bound to an already-closed event loop; the process is exiting anyway
+        pass
@@ -0,0 +1,264 @@
+import functools
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Type, TypeVar
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic_ai import Agent
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.usage import Usage
+
+from config import Config
+from agents import AGENT_SPECS
+from agents.rate_limit import llm_rate_limiter
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    HAS_SENTENCE_TRANSFORMERS = True
+except ImportError:  # Semantic near-match is optional; exact-match caching always works
+    HAS_SENTENCE_TRANSFORMERS = False
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CACHE_TTL_SECONDS = 24 * 60 * 60
+CACHE_MAX_ENTRIES = 10_000
+MEMORY_CACHE_ENTRIES = 512
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+SIMILARITY_THRESHOLD = 0.95
+
+
+class SemanticCache:
+    """
+    Caches agent outputs keyed on (agent_name, prompt) in SQLite, fronted by an in-process LRU.
+    The module helpers pass an agent_name that also carries the agent's model and system prompt hash.
+
+    Lookups try an exact prompt-hash match (memory, then SQLite) and then, if the semantic tier
+    is enabled and sentence-transformers is installed, the most similar cached prompt for the
+    same agent (cosine >= 0.95). Entries expire after 24h and the least recently used are
+    evicted beyond 10k entries.
+    """
+    def __init__(
+        self, path: str, ttl_seconds: int = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES,
+        semantic: bool = False
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic and HAS_SENTENCE_TRANSFORMERS
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[str, int, float]] = OrderedDict()
+        # Last use of entries served from memory, written to SQLite before the next eviction
+        self._memory_hits: dict[str, float] = {}
+        self._encoder: Any = None
+        # Separate from _lock: _embed also runs inside get() while _lock is held
+        self._encoder_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                agent_name TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                output TEXT NOT NULL,
+                embedding BLOB,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_agent ON responses (agent_name)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(agent_name: str, prompt: str) -> str:
+        return hashlib.blake2b(f"{agent_name}\0{prompt}".encode(), digest_size=16).hexdigest()
+
+    def _remember(self, key: str, output_json: str, tokens: int, created_at: float) -> None:
+        """Keep an entry in the in-process LRU tier."""
+        self._memory[key] = (output_json, tokens, created_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > MEMORY_CACHE_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _embed(self, text: str) -> Optional[Any]:
+        if not self.semantic:
+            return None
+        with self._encoder_lock:
+            if self._encoder is None:
+                self._encoder = SentenceTransformer(EMBEDDING_MODEL)
+        return self._encoder.encode(text, normalize_embeddings=True).astype(np.float32)
+
+    def get(self, agent_name: str, prompt: str) -> Optional[tuple[str, int]]:
+        """Return the cached (output_json, tokens) for this prompt, or None on a miss."""
+        now = time.time()
+        key = self._key(agent_name, prompt)
+        with self._lock:
+            memory_entry = self._memory.get(key)
+            if memory_entry is not None and memory_entry[2] >= now - self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._memory_hits[key] = now
+                return memory_entry[0], memory_entry[1]
+
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            row = self._conn.execute("SELECT output, tokens, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                nearest = self._nearest(agent_name, prompt)
+                if nearest is not None:
+                    key, row = nearest
+
+            if row is None:
+                # Commit the expiry sweep, so a miss doesn't leave a write transaction open on the file
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            # Keep the stored creation time, so promotion into memory doesn't restart the TTL
+            self._remember(key, row[0], row[1], row[2])
+            return row[0], row[1]
+
+    def _nearest(self, agent_name: str, prompt: str) -> Optional[tuple[str, tuple[str, int, float]]]:
+        """Find the key and row of the most similar cached prompt for this agent above the similarity threshold."""
+        query = self._embed(prompt)
+        if query is None:
+            return None
+
+        best: Optional[tuple[str, tuple[str, int, float]]] = None
+        best_score = SIMILARITY_THRESHOLD
+        rows = self._conn.execute(
+            "SELECT key, output, tokens, created_at, embedding FROM responses WHERE agent_name = ? AND embedding IS NOT NULL",
+            (agent_name,)
+        )
+        for key, output, tokens, created_at, embedding in rows:
+            score = float(np.dot(query, np.frombuffer(embedding, dtype=np.float32)))
+            if score >= best_score:
+                best, best_score = (key, (output, tokens, created_at)), score
+
+        return best
+
+    def set(self, agent_name: str, prompt: str, output_json: str, tokens: int = 0) -> None:
+        """Store an agent output, evicting the least recently used entries beyond the size bound."""
+        embedding = self._embed(prompt)
+        now = time.time()
+        key = self._key(agent_name, prompt)
+        with self._lock:
+            self._remember(key, output_json, tokens, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, agent_name, prompt, output_json,
+                    embedding.tobytes() if embedding is not None else None, tokens, now, now
+                )
+            )
+            self._conn.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(last_used, hit_key) for hit_key, last_used in self._memory_hits.items()]
+            )
+            self._memory_hits.clear()
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+
+response_cache = SemanticCache(Config.get_cache_path(), semantic=Config.SEMANTIC_CACHE_ENABLED)
+
+
+def report_prompt_cache_usage(agent_name: str, usage: Usage) -> None:
+    """Log provider-side prompt cache activity (Gemini implicit caching, Anthropic cache_control) for a run."""
+    details = usage.details or {}
+    cache_read = details.get("cached_content_tokens", 0) + details.get("cache_read_input_tokens", 0)
+    cache_write = details.get("cache_creation_input_tokens", 0)
+    if cache_read or cache_write:
+        logger.info("Prompt cache for %s: %d tokens read, %d tokens written", agent_name, cache_read, cache_write)
+
+
+_MISS = object()
+
+
+_TYPE_ADAPTERS: dict[Any, TypeAdapter[Any]] = {}
+
+
+def _type_adapter(output_type: Type[T]) -> TypeAdapter[T]:
+    """Build the validator/serializer for an agent output type once, rather than on every run."""
+    adapter = _TYPE_ADAPTERS.get(output_type)
+    if adapter is None:
+        adapter = _TYPE_ADAPTERS[output_type] = TypeAdapter(output_type)
+    return adapter
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_namespace(agent_name: str) -> str:
+    """
+    Scope an agent's cache entries to its model and system prompt, so outputs written before either
+    changed in AGENT_SPECS are no longer served.
+    """
+    model, _, system_prompt = AGENT_SPECS[agent_name]
+    system_prompt_hash = hashlib.blake2b(system_prompt.encode(), digest_size=8).hexdigest()
+    return f"{agent_name}@{model}#{system_prompt_hash}"
+
+
+def _lookup(agent_name: str, prompt: str, adapter: TypeAdapter) -> Any:
+    """Return the cached output for this prompt, or _MISS."""
+    cached = response_cache.get(_cache_namespace(agent_name), prompt)
+    if cached is None:
+        return _MISS
+
+    output_json, tokens = cached
+    try:
+        output = adapter.validate_json(output_json)
+    except ValidationError:
+        # Stored before a stricter model validator existed; regenerate instead
+        return _MISS
+
+    logger.info("Cache hit for %s (%d tokens saved)", agent_name, tokens)
+    return output
+
+
+def _store(agent_name: str, prompt: str, adapter: TypeAdapter, output: Any, usage: Usage) -> None:
+    """Record a fresh agent output in the response cache."""
+    report_prompt_cache_usage(agent_name, usage)
+    response_cache.set(_cache_namespace(agent_name), prompt, adapter.dump_json(output).decode(), usage.total_tokens or 0)
+
+
+def get_cached_output(agent_name: str, prompt: str, output_type: Type[T]) -> Optional[T]:
+    """Return the cached output for this prompt, or None on a miss. For callers that run the agent themselves."""
+    output = _lookup(agent_name, prompt, _type_adapter(output_type))
+    return None if output is _MISS else output
+
+
+def store_output(agent_name: str, prompt: str, output_type: Type[T], output: T, usage: Usage) -> None:
+    """Record an output produced outside cached_call (e.g. a streamed run) in the response cache."""
+    _store(agent_name, prompt, _type_adapter(output_type), output, usage)
+
+
+async def cached_call(
+    agent_name: str, prompt: str, output_type: Type[T], run: Callable[[], Awaitable[AgentRunResult[T]]]
+) -> T:
+    """Serve a prompt from the response cache, or await run() for a fresh agent result and cache it."""
+    adapter = _type_adapter(output_type)
+    output = _lookup(agent_name, prompt, adapter)
+    if output is not _MISS:
+        return output
+
+    result = await run()
+    _store(agent_name, prompt, adapter, result.output, result.usage())
+    return result.output
+
+
+async def cached_run_async(agent: Agent[Any, T], agent_name: str, prompt: str, output_type: Type[T]) -> T:
+    """Run an agent, serving identical or near-identical prompts from the response cache."""
+    async def run() -> AgentRunResult[T]:
+        await llm_rate_limiter.acquire()
+        return await agent.run(prompt)
+
+    return await cached_call(agent_name, prompt, output_type, run)
@@ -1,340 +1,709 @@
-from typing import Dict, List
-from models import FinalVeoPrompt, MultiScenePrompt
+import asyncio
+import functools
+import logging
+import random
+import re
+from collections import Counter
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Coroutine, Dict, FrozenSet, Iterator, List, NamedTuple, Tuple, TypeVar
+from models import Character, CharacterType, EnrichedCharacters, FinalVeoPrompt, MultiScenePrompt, ScenePromptBatch
 from session_manager import SessionManager
-from agents import master_prompt_agent, string_agent
+import httpx
+from pydantic import ValidationError
+from pydantic_ai import Agent
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.exceptions import ModelHTTPError
+from agents import get_agent
+from agents.validators import find_cartoonish_terms
+from agents.templates import JINJA_ENV
+from agents.cache import cached_call, cached_run_async, get_cached_output, store_output
+from agents.rate_limit import llm_rate_limiter
 from config import Config
-from jinja2 import Environment, FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Fields of a multi-scene video scene as submitted by the UI
+SCENE_FIELDS = ('character', 'scene_setting', 'action_dialogue', 'camera_style', 'sounds', 'landscape', 'props')
+
+# Static instructions shared by every scene prompt. Keeping them at the start of the user message
+# extends the provider-side prompt cache prefix (Gemini implicit caching) beyond the system prompt.
+SCENE_PROMPT_HEADER = "\n".join([
+    "Create a professional 8-second YouTube vlog scene in the 'Outdoor Boys' style.",
+    "\nCRITICAL INSTRUCTIONS:",
+    "- Create a completely self-contained prompt with NO references to 'previous scenes' or 'earlier episodes'",
+    "- Use the consistent character descriptions provided to maintain continuity",
+    "- Generate rich, detailed descriptions matching GREATLY_WORKED_PROMPTS.md quality",
+    "- Ensure authentic 'Outdoor Boys' vlog style throughout",
+    "- This must work as a standalone 8-second video prompt",
+    "- Include specific dialogue and character interactions",
+    "- Maintain natural, realistic movements and expressions\n"
+])
+
+# Splits a comma-separated field into stripped tokens in a single pass
+_CSV_SPLIT = re.compile(r"\s*,\s*")
+
+class SceneResult(NamedTuple):
+    """Generated prompt for one scene of a multi-scene series."""
+    scene_number: int
+    prompt: FinalVeoPrompt
+
+def _split_csv(value: str) -> List[str]:
+    """Split an already-stripped comma-separated field into its non-empty tokens."""
+    return [token for token in _CSV_SPLIT.split(value) if token]
+
+def _normalize_scene(scene: Dict) -> Dict[str, str]:
+    """Return the scene with every field present and stripped, so it is only stripped once."""
+    return {field: (scene.get(field) or '').strip() for field in SCENE_FIELDS}
+
+def _tokenize_scenes(video_scenes: List[Dict[str, str]]) -> List[Dict[str, List[str]]]:
+    """Split every normalized scene's comma-separated fields once, for all the helpers that need the tokens."""
+    return [
+        {
+            'characters': _split_csv(scene['character']),
+            'props': _split_csv(scene['props']),
+            'landscape': _split_csv(scene['landscape']),
+            'sounds': _split_csv(scene['sounds'])
+        }
+        for scene in video_scenes
+    ]
+
+async def _indexed(index: int, coro: Awaitable[T]) -> Tuple[int, T | BaseException]:
+    """Await a coroutine and pair its result (or exception) with its index, for as_completed consumers."""
+    try:
+        return index, await coro
+    except Exception as e:
+        return index, e
+
+def _is_transient(error: Exception) -> bool:
+    """Check whether an agent error is worth retrying (rate limits, provider 5xx, network timeouts)."""
+    if isinstance(error, ModelHTTPError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+async def _run_with_retry(
+    agent: Agent[Any, T], prompt: str, semaphore: asyncio.Semaphore, *, tries: int = 3, base: float = 0.5
+) -> AgentRunResult[T]:
+    """Run an agent, retrying transient errors with jittered exponential backoff."""
+    for attempt in range(tries):
+        try:
+            async with semaphore:
+                await llm_rate_limiter.acquire()
+                return await agent.run(prompt)
+        except Exception as e:
+            if attempt == tries - 1 or not _is_transient(e):
+                raise
+            # Back off outside the semaphore so other scenes can use the slot meanwhile
+            await asyncio.sleep(base * 2 ** attempt + random.random() * 0.25)
+    raise ValueError(f"tries must be at least 1, got {tries}")
+
+def _require_agent(name: str) -> Agent[None, Any]:
+    """Return the named agent, raising when the Google API key is not set."""
+    agent = get_agent(name)
+    if not agent:
+        raise RuntimeError("Google API key not set. Cannot process input.")
+    return agent
+
+def _run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Drive a coroutine to completion on this thread's event loop, the same way Agent.run_sync does."""
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
+
+def _iterate_sync(stream: AsyncGenerator[T, None]) -> Iterator[T]:
+    """Drive an async generator from synchronous code (Streamlit), one item at a time on this thread's event loop."""
+    try:
+        while True:
+            try:
+                yield _run_sync(anext(stream))
+            except StopAsyncIteration:
+                return
+    finally:
+        _run_sync(stream.aclose())
+
+async def _with_stall_timeout(stream: AsyncIterator[T], stall_timeout: float) -> AsyncGenerator[T, None]:
+    """
+    Re-yield a stream's items, raising TimeoutError when the next one takes longer than stall_timeout to arrive.
+    The stream is closed however this generator ends, including on a timeout.
+    """
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(anext(stream), stall_timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        if isinstance(stream, AsyncGenerator):
+            await stream.aclose()
+
+# Structured input keys and their labels, in prompt order
+_FIELD_LABELS = (
+    ('character', 'Character'),
+    ('scene', 'Scene Setting'),
+    ('action', 'Action & Dialogue'),
+    ('camera_style', 'Camera Style'),
+    ('sounds', 'Sounds'),
+    ('landscape', 'Landscape'),
+    ('props', 'Props')
+)
+
+_EMPTY_PROMPT = "Create a simple, realistic YouTube vlog scene with natural characters and authentic feel."
+_PROMPT_PREFIX = "Create a high-quality YouTube vlog prompt based on these inputs:\n\n"
+_PROMPT_SUFFIX = "\n\nGenerate a rich, detailed prompt that matches the quality and style of professional vlog content, similar to 'Outdoor Boys' channel."
+
+@functools.lru_cache(maxsize=256)
+def _build_user_prompt(input_items: FrozenSet[Tuple[str, str]]) -> str:
+    """Build the master agent prompt for a set of structured inputs."""
+    inputs = dict(input_items)
+
+    # Add non-empty inputs to the prompt
+    prompt_parts = [f"{label}: {value}" for key, label in _FIELD_LABELS if (value := inputs.get(key, '').strip())]
+
+    if not prompt_parts:
+        return _EMPTY_PROMPT
+
+    return _PROMPT_PREFIX + "\n".join(prompt_parts) + _PROMPT_SUFFIX
 
 class Orchestrator:
+    # Compiled once at import; rendering reuses the compiled template instead of re-parsing it
+    _MULTI_SCENE_OUTPUT_TEMPLATE = JINJA_ENV.get_template("multi_scene_output.md.j2")
+    _VEO_PROMPT_TEMPLATE = JINJA_ENV.get_template("veoprompt.md.j2")
+
     def __init__(self, session: SessionManager) -> None:
         self.session = session
-        # Validate API keys on initialization
-        Config.validate_api_keys()
 
     def process_user_input(self, structured_inputs: Dict[str, str]) -> FinalVeoPrompt:
         """
         Process user inputs using a single master agent that generates high-quality prompts
         matching the style of GREATLY_WORKED_PROMPTS.md samples.
         """
+        return _run_sync(self.aprocess_user_input(structured_inputs))
+
+    async def aprocess_user_input(
+        self, structured_inputs: Dict[str, str], variation: int = 0, semaphore: asyncio.Semaphore | None = None
+    ) -> FinalVeoPrompt:
+        """
+        Async version of process_user_input, so several single-prompt generations can be awaited together.
+        A non-zero variation asks for a different take on the same inputs (and gets its own cache entry).
+        Callers running several generations at once pass a shared semaphore to bound their concurrency.
+        """
         # Check if master agent is available
+        master_prompt_agent = get_agent("master")
         if not master_prompt_agent:
             raise RuntimeError("Google API key not set. Cannot process input.")
 
         # Combine all user inputs into a coherent prompt request
         user_prompt = self._create_user_prompt(structured_inputs)
+        if variation:
+            user_prompt = f"{user_prompt}\n\nVariation {variation + 1}: take a clearly different creative angle on these inputs."
 
-        # Generate the final prompt using the master agent
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(Config.MAX_LLM_CONCURRENCY)
+
+        # Generate the final prompt using the master agent, reusing cached results for repeated inputs
+        # and retrying transient errors
         try:
-            prompt_result = master_prompt_agent.run_sync(user_prompt)
-            final_prompt: FinalVeoPrompt = prompt_result.output
+            final_prompt = await cached_call(
+                "master", user_prompt, FinalVeoPrompt, lambda: _run_with_retry(master_prompt_agent, user_prompt, semaphore)
+            )
+            self._check_realism(final_prompt, structured_inputs)
             return final_prompt
-        except Exception as e:
-            print(f"Error generating prompt: {e}")
+        except Exception:
+            logger.exception("Error generating prompt")
             # Fallback to basic prompt if master agent fails
             return self._create_fallback_prompt(structured_inputs)
 
+    def process_user_input_variations(self, structured_inputs: Dict[str, str], count: int) -> List[FinalVeoPrompt]:
+        """
+        Generate several variations of one single-scene prompt.
+        The variations are awaited together, so they take roughly as long as the slowest one.
+        """
+        return _run_sync(self._process_user_input_variations(structured_inputs, count))
+
+    async def _process_user_input_variations(self, structured_inputs: Dict[str, str], count: int) -> List[FinalVeoPrompt]:
+        """Generate all variations concurrently; each one already falls back to a basic prompt on failure."""
+        semaphore = asyncio.Semaphore(Config.MAX_LLM_CONCURRENCY)
+        return list(await asyncio.gather(
+            *(self.aprocess_user_input(structured_inputs, variation, semaphore) for variation in range(count))
+        ))
+
+    async def stream_user_input(self, structured_inputs: Dict[str, str]) -> AsyncGenerator[FinalVeoPrompt, None]:
+        """
+        Stream the master agent's prompt while it is being generated.
+        Each yielded value is a FinalVeoPrompt validated from the output received so far, so callers can render it
+        before the generation finishes. Partial outputs still missing required fields are skipped; models that send
+        the whole tool call at once (Gemini) therefore yield only the finished prompt. The last value is the complete
+        prompt. If streaming fails, the prompt comes from aprocess_user_input instead, with its retries and fallback.
+        """
+        master_prompt_agent: Agent[None, FinalVeoPrompt] | None = get_agent("master")
+        if not master_prompt_agent:
+            raise RuntimeError("Google API key not set. Cannot process input.")
+
+        user_prompt = self._create_user_prompt(structured_inputs)
+
+        # Inputs generated before (streamed or not) are served whole from the response cache
+        cached_prompt = get_cached_output("master", user_prompt, FinalVeoPrompt)
+        if cached_prompt is not None:
+            yield cached_prompt
+            return
+
+        try:
+            await llm_rate_limiter.acquire()
+            async with master_prompt_agent.run_stream(user_prompt) as result:
+                # Only the model's stream is timed; the rate limiter wait and cache lookups are not stalls
+                async for message, is_last in _with_stall_timeout(
+                    result.stream_structured(debounce_by=0.1), Config.STREAM_STALL_TIMEOUT_SECONDS
+                ):
+                    try:
+                        final_prompt = await result.validate_structured_output(message, allow_partial=not is_last)
+                    except ValidationError:
+                        if is_last:
+                            raise
+                        continue
+                    yield final_prompt
+            store_output("master", user_prompt, FinalVeoPrompt, final_prompt, result.usage())
+        except Exception:
+            logger.exception("Error streaming prompt")
+            # aprocess_user_input retries, checks realism and falls back to a basic prompt on its own
+            yield await self.aprocess_user_input(structured_inputs)
+            return
+
+        self._check_realism(final_prompt, structured_inputs)
+
+    def process_user_input_stream(self, structured_inputs: Dict[str, str]) -> Iterator[FinalVeoPrompt]:
+        """Synchronous wrapper around stream_user_input for Streamlit."""
+        return _iterate_sync(self.stream_user_input(structured_inputs))
+
+    def process_user_inputs_batch(self, inputs_list: List[Dict[str, str]]) -> List[FinalVeoPrompt]:
+        """
+        Process several independent single-scene inputs at once.
+        The master agent calls run concurrently, so the batch takes roughly as long as its slowest prompt.
+        """
+        if not get_agent("master"):
+            raise RuntimeError("Google API key not set. Cannot process input.")
+
+        return _run_sync(self._process_user_inputs_batch(inputs_list))
+
+    async def _process_user_inputs_batch(self, inputs_list: List[Dict[str, str]]) -> List[FinalVeoPrompt]:
+        """
+        Generate all prompts concurrently, bounded by Config.MAX_LLM_CONCURRENCY.
+        Each one retries transient errors and falls back to a basic prompt on its own, so one failure doesn't fail the batch.
+        """
+        semaphore = asyncio.Semaphore(Config.MAX_LLM_CONCURRENCY)
+        return list(await asyncio.gather(
+            *(self.aprocess_user_input(inputs, semaphore=semaphore) for inputs in inputs_list)
+        ))
+
     def process_multi_scene_input(self, multi_scene_data: Dict) -> str:
         """
         Process multiple video scenes with consistency across all videos.
         Each prompt will be completely self-contained with consistent character/environment descriptions.
         """
+        return _run_sync(self.aprocess_multi_scene_input(multi_scene_data))
+
+    async def aprocess_multi_scene_input(self, multi_scene_data: Dict) -> str:
+        """
+        Async version of process_multi_scene_input.
+        The per-scene master agent calls are independent, so they run concurrently.
+        """
+        master_prompt_agent, consistent_elements, scenes_to_generate = await self._prepare_multi_scene(multi_scene_data)
+        scene_prompts = await self._generate_all_scenes(master_prompt_agent, scenes_to_generate)
+
+        # Format all prompts into the final output
+        return self._format_multi_scene_output(scene_prompts, consistent_elements)
+
+    def process_multi_scene_batched(self, multi_scene_data: Dict) -> str:
+        """
+        Process multiple video scenes with a single LLM request for all of them.
+        Produces the same output as process_multi_scene_input.
+        """
+        return _run_sync(self.aprocess_multi_scene_batched(multi_scene_data))
+
+    async def aprocess_multi_scene_batched(self, multi_scene_data: Dict) -> str:
+        """
+        Async version of process_multi_scene_batched.
+        Saves one round trip per extra scene; if the batch fails or returns the wrong number of scenes,
+        the scenes are generated concurrently as in aprocess_multi_scene_input.
+        """
+        master_prompt_agent, consistent_elements, scenes_to_generate = await self._prepare_multi_scene(multi_scene_data)
+
+        try:
+            batch_prompt = self._create_scene_batch_prompt(scenes_to_generate, self._create_scene_prompt_prefix(consistent_elements))
+            batch = await cached_run_async(_require_agent("scene_batch"), "scene_batch", batch_prompt, ScenePromptBatch)
+            if len(batch.scenes) == len(scenes_to_generate):
+                scene_prompts = [
+                    SceneResult(scene_num, prompt) for (scene_num, _, _), prompt in zip(scenes_to_generate, batch.scenes)
+                ]
+                return self._format_multi_scene_output(scene_prompts, consistent_elements)
+            logger.warning("Scene batch returned %d prompts for %d scenes", len(batch.scenes), len(scenes_to_generate))
+        except Exception:
+            logger.exception("Error batch generating scenes")
+
+        scene_prompts = await self._generate_all_scenes(master_prompt_agent, scenes_to_generate)
+        return self._format_multi_scene_output(scene_prompts, consistent_elements)
+
+    def stream_multi_scene_input(self, multi_scene_data: Dict) -> Iterator[str]:
+        """
+        Synchronous wrapper around astream_multi_scene_input for callers without an event loop (Streamlit).
+        Drives the async stream one scene at a time on this thread's event loop.
+        """
+        return _iterate_sync(self.astream_multi_scene_input(multi_scene_data))
+
+    async def astream_multi_scene_input(self, multi_scene_data: Dict) -> AsyncGenerator[str, None]:
+        """
+        Stream the multi-scene output as scenes finish.
+        Each yielded value is the formatted output for the scenes completed so far, in scene order,
+        so the first scene is visible as soon as the fastest generation returns. The last value is the full output.
+        """
+        master_prompt_agent, consistent_elements, scenes_to_generate = await self._prepare_multi_scene(multi_scene_data)
+
+        scene_prompts: List[SceneResult | None] = [None] * len(scenes_to_generate)
+        async for index, scene_result in self._generate_scene_results(master_prompt_agent, scenes_to_generate):
+            scene_prompts[index] = scene_result
+            yield self._format_multi_scene_output([scene for scene in scene_prompts if scene], consistent_elements)
+
+    async def _prepare_multi_scene(self, multi_scene_data: Dict) -> Tuple[Agent[None, FinalVeoPrompt], Dict, List[Tuple[int, Dict[str, str], str]]]:
+        """Build the consistent elements and every self-contained scene prompt, ahead of any scene generation."""
+        master_prompt_agent = get_agent("master")
         if not master_prompt_agent:
             raise RuntimeError("Google API key not set. Cannot process input.")
 
-        video_scenes = multi_scene_data.get('video_scenes', [])
+        # Strip every scene field once up front; the helpers below use the normalized values directly
+        video_scenes = [_normalize_scene(scene) for scene in multi_scene_data.get('video_scenes', [])]
         overall_story = multi_scene_data.get('overall_story', '')
         main_characters = multi_scene_data.get('main_characters', '')
 
         if not video_scenes:
             raise ValueError("No video scenes provided")
 
-        # First pass: Generate consistent elements across all scenes
-        consistent_elements = self._build_consistent_elements(video_scenes, overall_story, main_characters)
+        # Tokenize the comma-separated fields once; every helper below reuses these tokens
+        scene_tokens = _tokenize_scenes(video_scenes)
 
-        # Second pass: Generate individual self-contained prompts
-        scene_prompts = []
+        # First pass: Generate consistent elements across all scenes
+        consistent_elements = await self._build_consistent_elements(video_scenes, scene_tokens, overall_story, main_characters)
 
-        for i, scene_data in enumerate(video_scenes):
+        # Build every self-contained scene prompt up front (pure CPU work).
+        # The prefix is identical for every scene, so it is built once here.
+        prompt_prefix = self._create_scene_prompt_prefix(consistent_elements)
+        scenes_to_generate = []
+        for i, (scene_data, tokens) in enumerate(zip(video_scenes, scene_tokens)):
             scene_num = i + 1
 
             # Skip empty scenes
-            if not any(scene_data.get(field, '').strip() for field in ['character', 'scene_setting', 'action_dialogue']):
+            if not (scene_data['character'] or scene_data['scene_setting'] or scene_data['action_dialogue']):
                 continue
 
-            try:
-                # Create fully self-contained prompt for this scene
-                scene_prompt = self._create_self_contained_scene_prompt(scene_data, scene_num, consistent_elements)
-
-                # Generate the prompt using master agent
-                prompt_result = master_prompt_agent.run_sync(scene_prompt)
-                final_prompt: FinalVeoPrompt = prompt_result.output
-
-                scene_prompts.append({
-                    'scene_number': scene_num,
-                    'prompt': final_prompt
-                })
-
-            except Exception as e:
-                print(f"Error generating scene {scene_num}: {e}")
-                # Create fallback for this scene
-                fallback_prompt = self._create_fallback_prompt({
-                    'character': scene_data.get('character', ''),
-                    'scene': scene_data.get('scene_setting', ''),
-                    'action': scene_data.get('action_dialogue', '')
-                })
-                scene_prompts.append({
-                    'scene_number': scene_num,
-                    'prompt': fallback_prompt
-                })
-
-        # Format all prompts into the final output
-        return self._format_multi_scene_output(scene_prompts, consistent_elements)
+            scene_prompt = self._create_self_contained_scene_prompt(scene_data, tokens, scene_num, consistent_elements, prompt_prefix)
+            scenes_to_generate.append((scene_num, scene_data, scene_prompt))
+
+        return master_prompt_agent, consistent_elements, scenes_to_generate
+
+    async def _generate_all_scenes(
+        self, master_prompt_agent: Agent[None, FinalVeoPrompt], scenes_to_generate: List[Tuple[int, Dict[str, str], str]]
+    ) -> List[SceneResult]:
+        """Generate every scene concurrently and return the results in scene order."""
+        # Results go into index-aligned slots, so scene order is preserved
+        scene_prompts: List[SceneResult | None] = [None] * len(scenes_to_generate)
+        async for index, scene_result in self._generate_scene_results(master_prompt_agent, scenes_to_generate):
+            scene_prompts[index] = scene_result
+        # Every index is yielded exactly once, so no slot is left empty
+        return [scene for scene in scene_prompts if scene is not None]
+
+    async def _generate_scene_results(
+        self, master_prompt_agent: Agent[None, FinalVeoPrompt], scenes_to_generate: List[Tuple[int, Dict[str, str], str]]
+    ) -> AsyncIterator[Tuple[int, SceneResult]]:
+        """
+        Generate every scene concurrently and yield (index, SceneResult) pairs in completion order.
+        Failed scenes are replaced by a fallback prompt, so every index is yielded exactly once.
+        """
+        # Start all scene generations; the semaphore bounds the fan-out so long series
+        # don't burst past the provider's rate limits
+        semaphore = asyncio.Semaphore(Config.MAX_LLM_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(_indexed(index, self._generate_scene_prompt(master_prompt_agent, scene_prompt, semaphore)))
+            for index, (_, _, scene_prompt) in enumerate(scenes_to_generate)
+        ]
 
-    def _build_consistent_elements(self, video_scenes: List[Dict], overall_story: str, main_characters: str) -> Dict[str, str]:
+        try:
+            # Post-process each scene as soon as it resolves, while the others are still in flight
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                scene_num, scene_data, _ = scenes_to_generate[index]
+
+                if isinstance(result, BaseException):
+                    logger.warning("Error generating scene %d", scene_num, exc_info=result)
+                    # Create fallback for this scene
+                    result = self._create_fallback_prompt({
+                        'character': scene_data['character'],
+                        'scene': scene_data['scene_setting'],
+                        'action': scene_data['action_dialogue']
+                    })
+
+                yield index, SceneResult(scene_num, result)
+        finally:
+            # A consumer that stops early must not leave scene generations running
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_scene_prompt(self, master_prompt_agent: Agent[None, FinalVeoPrompt], scene_prompt: str, semaphore: asyncio.Semaphore) -> FinalVeoPrompt:
+        """Generate one scene's prompt using the master agent, reusing cached results for repeated scenes."""
+        return await cached_call(
+            "master", scene_prompt, FinalVeoPrompt, lambda: _run_with_retry(master_prompt_agent, scene_prompt, semaphore)
+        )
+
+    async def _build_consistent_elements(
+        self, video_scenes: List[Dict], scene_tokens: List[Dict[str, List[str]]], overall_story: str, main_characters: str
+    ) -> Dict[str, str]:
         """Build consistent character descriptions, props, and environments that will be identical across all scenes."""
 
-        # Collect all unique elements
-        all_characters = {}
-        all_props = set()
-        all_landscapes = set()
-        all_sounds = set()
+        # Count how many scenes reference each element, so truncation keeps the most-referenced ones;
+        # Counter.most_common breaks ties by first appearance, so the result stays deterministic
+        character_counts: Counter[str] = Counter()
+        prop_counts: Counter[str] = Counter()
+        landscape_counts: Counter[str] = Counter()
+        sound_counts: Counter[str] = Counter()
 
         # Extract and consolidate elements from all scenes
-        for scene in video_scenes:
-            # Characters - build detailed descriptions
-            if scene.get('character', '').strip():
-                chars = [char.strip() for char in scene['character'].split(',')]
-                for char in chars:
-                    if char and char not in all_characters:
-                        all_characters[char] = char  # Will be enhanced later
-
-            # Props
-            if scene.get('props', '').strip():
-                all_props.update([prop.strip() for prop in scene['props'].split(',') if prop.strip()])
-
-            # Landscapes
-            if scene.get('landscape', '').strip():
-                all_landscapes.update([land.strip() for land in scene['landscape'].split(',') if land.strip()])
-
-            # Sounds
-            if scene.get('sounds', '').strip():
-                all_sounds.update([sound.strip() for sound in scene['sounds'].split(',') if sound.strip()])
+        for tokens in scene_tokens:
+            character_counts.update(tokens['characters'])
+            prop_counts.update(tokens['props'])
+            landscape_counts.update(tokens['landscape'])
+            sound_counts.update(tokens['sounds'])
 
         # Build consistent character descriptions from user inputs
-        character_descriptions = self._generate_consistent_character_descriptions(video_scenes, main_characters)
+        character_descriptions = await self._generate_consistent_character_descriptions(video_scenes, scene_tokens, main_characters)
 
         return {
             'overall_story': overall_story or 'Authentic outdoor adventure vlog',
-            'main_characters': main_characters or ', '.join(list(all_characters.keys())[:3]),
+            'main_characters': main_characters or ', '.join(char for char, _ in character_counts.most_common(3)),
             'character_descriptions': character_descriptions,
-            'consistent_props': list(all_props)[:5],  # Top 5 most important props
-            'consistent_landscape': list(all_landscapes)[:3],  # Key landscape elements
-            'consistent_sounds': list(all_sounds)[:7],  # Essential sound elements
+            'consistent_props': [prop for prop, _ in prop_counts.most_common(5)],  # Top 5 most important props
+            'consistent_landscape': [land for land, _ in landscape_counts.most_common(3)],  # Key landscape elements
+            'consistent_sounds': [sound for sound, _ in sound_counts.most_common(7)],  # Essential sound elements
             'vlog_style': 'Outdoor Boys authentic handheld vlog style',
             'total_scenes': len(video_scenes)
         }
 
-    def _generate_consistent_character_descriptions(self, video_scenes: List[Dict], main_characters: str) -> Dict[str, str]:
+    async def _generate_consistent_character_descriptions(
+        self, video_scenes: List[Dict], scene_tokens: List[Dict[str, List[str]]], main_characters: str
+    ) -> Dict[str, str]:
         """Generate consistent character descriptions based on user inputs using AI."""
-        if not string_agent:
+        if not get_agent("string"):
             return {}
 
         # Collect all character mentions from scenes
         all_character_info = {}
 
-        for scene in video_scenes:
-            if scene.get('character', '').strip():
-                # Parse characters from this scene
-                chars = [char.strip() for char in scene['character'].split(',')]
-                for char in chars:
-                    if char:
-                        # Store the most detailed description we find
-                        if char not in all_character_info or len(scene['character']) > len(all_character_info[char]):
-                            all_character_info[char] = scene['character']
+        for scene, tokens in zip(video_scenes, scene_tokens):
+            if scene['character']:
+                # Characters from this scene, already tokenized
+                for char in tokens['characters']:
+                    # Store the most detailed description we find
+                    if char not in all_character_info or len(scene['character']) > len(all_character_info[char]):
+                        all_character_info[char] = scene['character']
 
         if not all_character_info:
             return {}
 
-        character_descriptions = {}
+        character_descriptions = await self._enhance_characters(list(all_character_info.items())[:3])  # Limit to 3 main characters
+        self._update_character_memory(character_descriptions)
 
-        for char in list(all_character_info.keys())[:3]:  # Limit to 3 main characters
-            # Use the string agent to enhance the user's character description
-            enhancement_prompt = f"""
-Enhance this character description for professional YouTube vlog consistency: "{all_character_info[char]}"
+        return character_descriptions
 
-Character: {char}
-User description: {all_character_info[char]}
+    def _update_character_memory(self, character_descriptions: Dict[str, str]) -> None:
+        """Remember characters the session has not seen yet, in a single bulk write."""
+        missing = character_descriptions.keys() - self.session.get_character_names()
+        self.session.add_characters([
+            Character(
+                name=name,
+                character_type=next((t for t in CharacterType if t.value == name.lower()), CharacterType.CUSTOM),
+                physical_description=character_descriptions[name],
+                personality_traits=[],
+                consistency_notes="Enhanced description used for multi-scene consistency."
+            )
+            for name in missing
+        ])
 
-Make it 15-25 words, focus on visual details, maintain authentic realistic style.
-Return ONLY the enhanced description.
-"""
+    async def _enhance_characters(self, characters: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Enhance all characters in one LLM call, falling back to parallel per-character calls."""
+        if get_agent("character_batch"):
             try:
-                enhanced_result = string_agent.run_sync(enhancement_prompt)
-                character_descriptions[char] = enhanced_result.output.strip()
-
-                # Clean up the description if it has quotes
-                if character_descriptions[char].startswith('"') and character_descriptions[char].endswith('"'):
-                    character_descriptions[char] = character_descriptions[char][1:-1]
+                character_descriptions = await self._enhance_characters_batch(characters)
+                if all(char in character_descriptions for char, _ in characters):
+                    return character_descriptions
+            except Exception:
+                logger.exception("Error batch enhancing characters")
+
+        # Each per-character call is an independent LLM round-trip, so run them concurrently
+        enhanced = await asyncio.gather(
+            *(self._enhance_character(char, description) for char, description in characters),
+            return_exceptions=True
+        )
 
-            except Exception as e:
-                print(f"Error enhancing character {char}: {e}")
+        character_descriptions = {}
+        for (char, description), result in zip(characters, enhanced):
+            if isinstance(result, BaseException):
+                logger.warning("Error enhancing character %s", char, exc_info=result)
                 # Fallback to user's original description
-                character_descriptions[char] = all_character_info[char]
+                character_descriptions[char] = description
+            else:
+                character_descriptions[char] = result
 
         return character_descriptions
 
-    def _create_self_contained_scene_prompt(self, scene_data: Dict, scene_num: int, consistent_elements: Dict) -> str:
+    async def _enhance_characters_batch(self, characters: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Enhance every character description with a single structured agent call."""
+        character_lines = "\n".join(f"- {char}: {description}" for char, description in characters)
+        batch_prompt = f"""
+Enhance these character descriptions for professional YouTube vlog consistency:
+
+{character_lines}
+
+Make each one 15-25 words, focus on visual details, maintain authentic realistic style.
+"""
+        enriched = await cached_run_async(_require_agent("character_batch"), "character_batch", batch_prompt, EnrichedCharacters)
+
+        character_descriptions = {}
+        for appearance in enriched.characters:
+            # Clean up the description if it has quotes
+            character_descriptions[appearance.character_name] = appearance.appearance_description.strip().strip('"')
+
+        return character_descriptions
+
+    async def _enhance_character(self, char: str, description: str) -> str:
+        """Enhance a single character description using the string agent."""
+        enhancement_prompt = f"""
+Enhance this character description for professional YouTube vlog consistency: "{description}"
+
+Character: {char}
+User description: {description}
+
+Make it 15-25 words, focus on visual details, maintain authentic realistic style.
+Return ONLY the enhanced description.
+"""
+        enhanced_output = await cached_run_async(_require_agent("string"), "string", enhancement_prompt, str)
+        enhanced = enhanced_output.strip()
+
+        # Clean up the description if it has quotes
+        if enhanced.startswith('"') and enhanced.endswith('"'):
+            enhanced = enhanced[1:-1]
+
+        return enhanced
+
+    def _create_scene_prompt_prefix(self, consistent_elements: Dict) -> str:
+        """Create the part of the scene prompt shared by every scene in the series."""
+        # The invariant instructions come first so every scene shares the longest possible cached prefix
+        return f"{SCENE_PROMPT_HEADER}\nThis scene is part of: {consistent_elements['overall_story']}"
+
+    def _create_scene_batch_prompt(self, scenes_to_generate: List[Tuple[int, Dict[str, str], str]], prompt_prefix: str) -> str:
+        """Combine every scene prompt into one request, stating the shared prefix only once."""
+        scene_sections = "\n\n".join(
+            f"SCENE {scene_num}:{scene_prompt.removeprefix(prompt_prefix)}" for scene_num, _, scene_prompt in scenes_to_generate
+        )
+        return (
+            f"{prompt_prefix}\n\n"
+            f"Write {len(scenes_to_generate)} separate scene prompts, one per scene below and in the same order. "
+            "Every scene prompt must follow all of the instructions above on its own.\n\n"
+            f"{scene_sections}"
+        )
+
+    def _create_self_contained_scene_prompt(
+        self, scene_data: Dict, tokens: Dict[str, List[str]], scene_num: int, consistent_elements: Dict, prompt_prefix: str
+    ) -> str:
         """Create a completely self-contained prompt with consistent descriptions but no references to other scenes."""
 
-        # Start with the scene-specific information
-        prompt_parts = [
-            f"Create a professional 8-second YouTube vlog scene in the 'Outdoor Boys' style.",
-            f"This scene is part of: {consistent_elements['overall_story']}"
-        ]
+        character_descriptions = consistent_elements['character_descriptions']
+        landscape = scene_data['landscape']
+        landscape_lower = landscape.lower()
+
+        # Start with the shared prefix, then add the scene-specific information
+        prompt_parts = [prompt_prefix]
 
         # Use consistent character descriptions
-        if scene_data.get('character', '').strip():
-            scene_chars = [char.strip() for char in scene_data['character'].split(',')]
-            consistent_char_desc = []
-            for char in scene_chars:
-                if char in consistent_elements['character_descriptions']:
-                    consistent_char_desc.append(consistent_elements['character_descriptions'][char])
-                else:
-                    consistent_char_desc.append(char)
+        if scene_data['character']:
+            consistent_char_desc = [character_descriptions.get(char, char) for char in tokens['characters']]
             prompt_parts.append(f"Characters: {', and '.join(consistent_char_desc)}")
 
         # Scene-specific details
-        if scene_data.get('scene_setting', '').strip():
+        if scene_data['scene_setting']:
             prompt_parts.append(f"Scene Setting: {scene_data['scene_setting']}")
 
-        if scene_data.get('action_dialogue', '').strip():
+        if scene_data['action_dialogue']:
             prompt_parts.append(f"Action & Dialogue: {scene_data['action_dialogue']}")
 
-        if scene_data.get('camera_style', '').strip():
+        if scene_data['camera_style']:
             prompt_parts.append(f"Camera Style: {scene_data['camera_style']}")
         else:
             prompt_parts.append("Camera Style: POV, selfie stick, handheld and natural")
 
-        # Combine scene sounds with consistent background sounds
-        scene_sounds = []
-        if scene_data.get('sounds', '').strip():
-            scene_sounds.extend([s.strip() for s in scene_data['sounds'].split(',') if s.strip()])
-
-        # Add consistent environmental sounds that don't conflict
-        for sound in consistent_elements['consistent_sounds']:
-            if sound not in scene_sounds:
-                scene_sounds.append(sound)
+        # Combine scene sounds with consistent environmental sounds; dict.fromkeys drops duplicates
+        # with hashed membership checks while keeping the scene's own sounds first
+        scene_sounds = list(dict.fromkeys([*tokens['sounds'], *consistent_elements['consistent_sounds']]))
 
         if scene_sounds:
             prompt_parts.append(f"Sounds: {', '.join(scene_sounds[:7])}")  # Limit to 7 sounds max
 
         # Landscape with consistent elements
-        landscape_elements = []
-        if scene_data.get('landscape', '').strip():
-            landscape_elements.append(scene_data['landscape'])
+        landscape_elements = [landscape] if landscape else []
 
         # Add consistent landscape elements that enhance the scene
-        for land in consistent_elements['consistent_landscape']:
-            if land.lower() not in scene_data.get('landscape', '').lower():
-                landscape_elements.append(land)
+        landscape_elements.extend(
+            land for land in consistent_elements['consistent_landscape'] if land.lower() not in landscape_lower
+        )
 
         if landscape_elements:
             prompt_parts.append(f"Landscape: {', '.join(landscape_elements[:3])}")
 
-        # Props with consistent elements
-        props_elements = []
-        if scene_data.get('props', '').strip():
-            props_elements.extend([p.strip() for p in scene_data['props'].split(',') if p.strip()])
-
-        # Add consistent props that make sense for continuity
-        for prop in consistent_elements['consistent_props']:
-            if prop not in props_elements:
-                props_elements.append(prop)
+        # Props with consistent props added for continuity, deduplicated the same way
+        props_elements = list(dict.fromkeys([*tokens['props'], *consistent_elements['consistent_props']]))
 
         if props_elements:
             prompt_parts.append(f"Props: {', '.join(props_elements[:5])}")
 
-        # Final instructions for self-contained, high-quality output
-        prompt_parts.extend([
-            "\nCRITICAL INSTRUCTIONS:",
-            "- Create a completely self-contained prompt with NO references to 'previous scenes' or 'earlier episodes'",
-            "- Use the consistent character descriptions provided to maintain continuity",
-            "- Generate rich, detailed descriptions matching GREATLY_WORKED_PROMPTS.md quality",
-            "- Ensure authentic 'Outdoor Boys' vlog style throughout",
-            "- This must work as a standalone 8-second video prompt",
-            "- Include specific dialogue and character interactions",
-            "- Maintain natural, realistic movements and expressions"
-        ])
-
         return "\n".join(prompt_parts)
 
-    def _format_multi_scene_output(self, scene_prompts: List[Dict], consistent_elements: Dict) -> str:
+    def _format_multi_scene_output(self, scene_prompts: List[SceneResult], consistent_elements: Dict) -> str:
         """Format all scene prompts into the final multi-video output with completely self-contained prompts."""
-        output_parts = [
-            f"# Multi-Scene Professional Vlog Prompts\n",
-            f"**Total Duration:** {len(scene_prompts) * 8} seconds ({len(scene_prompts)} videos)",
-            f"**Overall Story:** {consistent_elements['overall_story']}",
-            f"**Main Characters:** {consistent_elements['main_characters']}",
-            f"**Style:** {consistent_elements['vlog_style']}\n",
-            "**Note:** Each prompt below is completely self-contained and can be used independently for VEO3 generation.\n",
-            "---\n"
-        ]
-
-        # Add individual video prompts - each completely self-contained
-        for scene_data in scene_prompts:
-            scene_num = scene_data['scene_number']
-            prompt = scene_data['prompt']
-
-            output_parts.extend([
-                f"## VIDEO {scene_num}:\n",
-                f"Create a realistic, entertaining YouTube vlog video in the style of the channel \"Outdoor Boys.\"\n",
-                f"{prompt.main_character_description}. {prompt.scene_setting_description}. {prompt.atmosphere_and_mood}.\n",
-                f"The video should look like a genuine, spontaneous scene from a real vlog, not cinematic or overly polished—just natural, handheld, and authentic.\n",
-                f"{prompt.core_action_and_dialogue}\n",
-                f"**Camera style:** {prompt.camera_style}\n",
-                f"**Sounds:** {', '.join(prompt.sounds)}\n",
-                f"**Landscape:** {prompt.landscape_notes}\n",
-                f"**Props:** {', '.join(prompt.props)}\n",
-                "---\n"
-            ])
-
-        return "\n".join(output_parts)
+        return self._MULTI_SCENE_OUTPUT_TEMPLATE.render(
+            scene_prompts=scene_prompts,
+            overall_story=consistent_elements['overall_story'],
+            main_characters=consistent_elements['main_characters'],
+            vlog_style=consistent_elements['vlog_style']
+        )
+
+    def render_prompt(self, final_prompt: FinalVeoPrompt) -> str:
+        """Render a single-scene prompt as the markdown shown to the user."""
+        # The template reads fields as attributes, so the model is never dumped to a dict
+        return self._VEO_PROMPT_TEMPLATE.render(prompt=final_prompt)
 
     def _create_user_prompt(self, inputs: Dict[str, str]) -> str:
         """Create a user prompt from the structured inputs."""
-        prompt_parts = []
-
-        # Add non-empty inputs to the prompt
-        field_labels = {
-            'character': 'Character',
-            'scene': 'Scene Setting',
-            'action': 'Action & Dialogue',
-            'camera_style': 'Camera Style',
-            'sounds': 'Sounds',
-            'landscape': 'Landscape',
-            'props': 'Props'
-        }
-
-        for key, label in field_labels.items():
-            if inputs.get(key, '').strip():
-                prompt_parts.append(f"{label}: {inputs[key].strip()}")
-
-        if not prompt_parts:
-            return "Create a simple, realistic YouTube vlog scene with natural characters and authentic feel."
+        # Identical structured inputs (retries, batches) reuse the already-built prompt
+        return _build_user_prompt(frozenset(inputs.items()))
 
-        user_prompt = "Create a high-quality YouTube vlog prompt based on these inputs:\n\n" + "\n".join(prompt_parts)
-        user_prompt += "\n\nGenerate a rich, detailed prompt that matches the quality and style of professional vlog content, similar to 'Outdoor Boys' channel."
-
-        return user_prompt
+    def _check_realism(self, final_prompt: FinalVeoPrompt, structured_inputs: Dict[str, str]) -> None:
+        """
+        Log cartoonish terms in a generated prompt that the user did not ask for.
+        Advisory only: the prompt is returned unchanged and the user is not told. The master system prompt
+        already enforces realism, so the log is there to spot drift, not to correct it.
+        """
+        requested_terms = set(find_cartoonish_terms(" ".join(structured_inputs.values())))
+        unrequested_terms = [term for term in find_cartoonish_terms(final_prompt.model_dump_json()) if term not in requested_terms]
+        if unrequested_terms:
+            logger.info("Generated prompt contains cartoonish terms: %s", ", ".join(unrequested_terms))
 
     def _create_fallback_prompt(self, inputs: Dict[str, str]) -> FinalVeoPrompt:
         """Create a basic fallback prompt if the master agent fails."""
         character = inputs.get('character', 'A friendly outdoor enthusiast')
         scene = inputs.get('scene', 'in a natural outdoor setting')
         action = inputs.get('action', 'exploring and sharing their adventure')
-        print("Fallback prompt created", character, scene, action)
+        logger.debug("Fallback prompt created: %s | %s | %s", character, scene, action)
 
-        return FinalVeoPrompt(
+        # Every field is a local string or literal, so skip validation (model_construct) on this error path
+        return FinalVeoPrompt.model_construct(
             main_character_description=character,
             scene_setting_description=scene,
             atmosphere_and_mood="Friendly, adventurous, and authentic",
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import time
+
+from config import Config
+
+
+class RateLimiter:
+    """
+    Spaces LLM requests evenly to stay under a provider's requests-per-minute quota.
+
+    Each caller reserves the next free send slot under a thread lock and then sleeps until it,
+    so one limiter is shared by every event loop in the process (Streamlit runs scripts on
+    several threads). A limit of 0 disables limiting.
+    """
+    def __init__(self, requests_per_minute: int) -> None:
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        """Reserve the next send slot and return how long to wait for it."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    async def acquire(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+llm_rate_limiter = RateLimiter(Config.LLM_REQUESTS_PER_MINUTE)
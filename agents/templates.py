@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
+
+from config import Config
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+# Output of scripts/precompile_templates.py; when present, templates are imported as Python modules
+COMPILED_TEMPLATE_DIR = TEMPLATE_DIR.parent / "compiled_templates"
+
+
+def build_environment(loader: BaseLoader) -> Environment:
+    """Create a Jinja2 environment with the template syntax options the app renders with."""
+    template_cache_dir = Path(Config.get_template_cache_dir())
+    template_cache_dir.mkdir(parents=True, exist_ok=True)
+    return Environment(
+        loader=loader,
+        bytecode_cache=FileSystemBytecodeCache(str(template_cache_dir)),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=False
+    )
+
+
+# Shared Jinja2 environment; templates are loaded and compiled once per process. Precompiled templates
+# skip compilation entirely; otherwise the compiled bytecode is kept on disk so a fresh worker skips
+# lexing and parsing them again.
+JINJA_ENV = build_environment(
+    ModuleLoader(str(COMPILED_TEMPLATE_DIR)) if COMPILED_TEMPLATE_DIR.is_dir() else FileSystemLoader(TEMPLATE_DIR)
+)
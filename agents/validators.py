@@ -0,0 +1,12 @@
+import re
+from typing import Tuple
+
+# Terms that signal a prompt drifting away from the realistic vlog style
+CARTOONISH_TERMS = ("cartoonish", "cartoon", "exaggerated", "animated", "superhero", "magic", "magical")
+
+# One precompiled alternation scans the text for every term in a single pass
+_CARTOONISH_PATTERN = re.compile(r"\b(" + "|".join(CARTOONISH_TERMS) + r")\b", re.IGNORECASE)
+
+def find_cartoonish_terms(text: str) -> Tuple[str, ...]:
+    """Return the distinct cartoonish terms found as whole words in the text, in order of appearance."""
+    return tuple(dict.fromkeys(match.lower() for match in _CARTOONISH_PATTERN.findall(text)))
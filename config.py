@@ -1,33 +1,76 @@
+import functools
+import logging
 import os
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 class Config:
-    """Configuration management for API keys and environment variables."""
+    """
+    Configuration management for API keys and environment variables.
+    Getters read the environment once per process; Streamlit reruns hit the cached values.
+    """
+
+    # Maximum number of LLM requests in flight at once, to stay under provider rate limits
+    MAX_LLM_CONCURRENCY = int(os.getenv("MAX_LLM_CONCURRENCY", "8"))
+
+    # Provider requests-per-minute quota shared by every LLM call in the process (0 = unlimited)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+
+    # Abort a streamed generation when no new output arrives for this many seconds. Models that send
+    # the whole structured output at once (Gemini) stay silent until they finish, so for them this
+    # bounds the entire generation.
+    STREAM_STALL_TIMEOUT_SECONDS = float(os.getenv("STREAM_STALL_TIMEOUT_SECONDS", "30"))
+
+    # Generate all scenes of a series in one LLM request instead of one concurrent request per scene.
+    # Saves round trips and per-request overhead, but the scenes are written one after another, so it
+    # is off by default.
+    MULTI_SCENE_SINGLE_REQUEST = os.getenv("MULTI_SCENE_SINGLE_REQUEST", "false").lower() in ("1", "true", "yes")
+
+    # Serve near-identical prompts from the response cache (needs sentence-transformers). Off by default:
+    # templated prompts that differ only in a character name can embed above the similarity threshold.
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def get_google_api_key() -> Optional[str]:
         """Get Google API key from environment variable."""
         return os.getenv("GOOGLE_API_KEY")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def get_anthropic_api_key() -> Optional[str]:
         """Get Anthropic API key from environment variable."""
         return os.getenv("ANTHROPIC_API_KEY")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def get_openai_api_key() -> Optional[str]:
         """Get OpenAI API key from environment variable."""
         return os.getenv("OPENAI_API_KEY")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def get_cache_path() -> str:
+        """Get the SQLite response cache location from environment variable."""
+        return os.getenv("VEOPROMPT_CACHE_PATH", ".veoprompt_cache.sqlite")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def get_template_cache_dir() -> str:
+        """Get the Jinja2 bytecode cache directory from environment variable."""
+        return os.getenv("VEOPROMPT_TEMPLATE_CACHE_DIR", ".jinja_cache")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
     def validate_api_keys() -> bool:
-        """Validate that required API keys are set."""
+        """Validate that required API keys are set. Runs once per process; later calls return the cached result."""
         google_key = Config.get_google_api_key()
         anthropic_key = Config.get_anthropic_api_key()
 
         if not google_key:
-            print("Warning: GOOGLE_API_KEY not set. Gemini models will not work.")
+            logger.warning("GOOGLE_API_KEY not set. Gemini models will not work.")
         if not anthropic_key:
-            print("Warning: ANTHROPIC_API_KEY not set. Claude models will not work.")
+            logger.warning("ANTHROPIC_API_KEY not set. Claude models will not work.")
 
         return bool(google_key and anthropic_key)
\ No newline at end of file
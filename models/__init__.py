@@ -1,7 +1,25 @@
-from pydantic import BaseModel, Field
+import re
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict
 from enum import Enum
 
+# VEO3 clips are 8 seconds long; sound timelines must fit inside them
+MAX_DURATION_SECONDS = 8
+
+# Only explicit timeline marks starting at minute zero count, so wall-clock times like "bells at 12:00"
+# pass: ranges ("0:05-0:09"), parenthesized offsets ("(0:03)") and "at" offsets ("at 0:07")
+_TIMELINE_RANGE_PATTERN = re.compile(r"\b0{1,2}:(\d{2})\s*[-\u2013]\s*(\d{1,2}):(\d{2})\b")
+_TIMELINE_OFFSET_PATTERN = re.compile(r"\(0{1,2}:(\d{2})\)|\bat\s+0{1,2}:(\d{2})\b", re.IGNORECASE)
+
+def _timeline_offsets(sound: str) -> List[int]:
+    """Return the offsets, in seconds, of the explicit timeline marks in a sound description."""
+    offsets = []
+    for start_sec, end_min, end_sec in _TIMELINE_RANGE_PATTERN.findall(sound):
+        offsets += [int(start_sec), int(end_min) * 60 + int(end_sec)]
+    for parenthesized_sec, at_sec in _TIMELINE_OFFSET_PATTERN.findall(sound):
+        offsets.append(int(parenthesized_sec or at_sec))
+    return offsets
+
 class CharacterType(str, Enum):
     BIGFOOT = "bigfoot"
     YETI = "yeti"
@@ -27,6 +45,10 @@ class CharacterAppearance(BaseModel):
     character_name: str
     appearance_description: str
 
+class EnrichedCharacters(BaseModel):
+    """Enhanced descriptions for all main characters, produced by a single LLM call"""
+    characters: List[CharacterAppearance]
+
 class VideoScene(BaseModel):
     scene_number: int
     character: str
@@ -48,6 +70,19 @@ class FinalVeoPrompt(BaseModel):
     landscape_notes: str
     props: List[str]
 
+    @field_validator("sounds")
+    @classmethod
+    def sounds_fit_duration(cls, sounds: List[str]) -> List[str]:
+        """Reject sound timelines that run past the end of the 8-second video."""
+        for sound in sounds:
+            if any(offset > MAX_DURATION_SECONDS for offset in _timeline_offsets(sound)):
+                raise ValueError(f"Sound timing '{sound}' exceeds the {MAX_DURATION_SECONDS}-second video duration")
+        return sounds
+
+class ScenePromptBatch(BaseModel):
+    """Final prompts for every scene of a series, produced by a single LLM call"""
+    scenes: List[FinalVeoPrompt]
+
 class MultiScenePrompt(BaseModel):
     """Container for multiple video scenes with consistency tracking"""
     overall_story: str
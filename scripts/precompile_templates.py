@@ -0,0 +1,20 @@
+"""
+Precompile the Jinja2 templates into Python modules, so app start-up does no template compilation.
+
+Run from the repository root, and again after editing anything in templates/:
+
+    uv run -m scripts.precompile_templates
+"""
+from jinja2 import FileSystemLoader
+
+from agents.templates import COMPILED_TEMPLATE_DIR, TEMPLATE_DIR, build_environment
+
+
+def main() -> None:
+    environment = build_environment(FileSystemLoader(TEMPLATE_DIR))
+    environment.compile_templates(str(COMPILED_TEMPLATE_DIR), zip=None, ignore_errors=False)
+    print(f"Compiled templates written to {COMPILED_TEMPLATE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
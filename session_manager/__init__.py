@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, KeysView, List, Sequence, ValuesView
 from models import Character, SceneInput
 
 class SessionManager:
@@ -12,9 +12,16 @@ class SessionManager:
     def add_character(self, character: Character) -> None:
         self.characters[character.name] = character
 
+    def add_characters(self, characters: List[Character]) -> None:
+        self.characters.update((character.name, character) for character in characters)
+
     def get_character(self, name: str) -> Character | None:
         return self.characters.get(name)
 
+    def get_character_names(self) -> KeysView[str]:
+        # Live views; callers read them without copying and must not mutate the session through them
+        return self.characters.keys()
+
     def add_scene(self, scene: SceneInput) -> None:
         self.scenes.append(scene)
 
@@ -23,8 +30,8 @@ class SessionManager:
             return self.scenes[-1]
         return None
 
-    def get_all_characters(self) -> List[Character]:
-        return list(self.characters.values())
+    def get_all_characters(self) -> ValuesView[Character]:
+        return self.characters.values()
 
-    def get_all_scenes(self) -> List[SceneInput]:
+    def get_all_scenes(self) -> Sequence[SceneInput]:
         return self.scenes
\ No newline at end of file
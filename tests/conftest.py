@@ -0,0 +1,4 @@
+import os
+
+# Keep the response cache out of the working directory while tests import the agents package
+os.environ.setdefault("VEOPROMPT_CACHE_PATH", ":memory:")
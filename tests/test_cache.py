@@ -0,0 +1,81 @@
+import time
+
+from pydantic_ai.usage import Usage
+
+import agents.cache as cache_module
+from agents.cache import SemanticCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return SemanticCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_promotion_keeps_the_stored_creation_time(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl_seconds=100)
+    cache.set("master", "prompt", '"output"', tokens=5)
+    cache._memory.clear()
+
+    # A SQLite hit moves the entry into memory; it must still expire 100s after it was stored
+    monkeypatch.setattr(time, "time", lambda: 1e12)
+    cache._conn.execute("UPDATE responses SET created_at = ?", (1e12 - 90,))
+    assert cache.get("master", "prompt") == ('"output"', 5)
+
+    monkeypatch.setattr(time, "time", lambda: 1e12 + 20)
+    assert cache.get("master", "prompt") is None
+
+
+def test_hit_and_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("master", "prompt", '"output"', tokens=5)
+
+    assert cache.get("master", "prompt") == ('"output"', 5)
+    assert cache.get("master", "other prompt") is None
+    assert cache.get("string", "prompt") is None
+
+    # A fresh instance on the same file is served from SQLite rather than memory
+    assert make_cache(tmp_path).get("master", "prompt") == ('"output"', 5)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl_seconds=100)
+    monkeypatch.setattr(time, "time", lambda: 1e12)
+    cache.set("master", "prompt", '"output"')
+
+    monkeypatch.setattr(time, "time", lambda: 1e12 + 99)
+    assert cache.get("master", "prompt") is not None
+
+    monkeypatch.setattr(time, "time", lambda: 1e12 + 101)
+    assert cache.get("master", "prompt") is None
+    assert make_cache(tmp_path, ttl_seconds=100).get("master", "prompt") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, max_entries=2)
+    clock = iter(range(1_000_000_000, 1_000_000_100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+
+    cache.set("master", "first", '"1"')
+    cache.set("master", "second", '"2"')
+    cache.get("master", "first")
+    cache.set("master", "third", '"3"')
+
+    reopened = make_cache(tmp_path, max_entries=2)
+    assert reopened.get("master", "first") is not None
+    assert reopened.get("master", "second") is None
+    assert reopened.get("master", "third") is not None
+
+
+def test_changing_an_agent_spec_invalidates_its_entries(monkeypatch):
+    model, output_type, system_prompt = cache_module.AGENT_SPECS["string"]
+    cache_module._cache_namespace.cache_clear()
+    cache_module.store_output("string", "unique test prompt", str, "cached output", Usage())
+    assert cache_module.get_cached_output("string", "unique test prompt", str) == "cached output"
+
+    monkeypatch.setitem(cache_module.AGENT_SPECS, "string", (model, output_type, system_prompt + " Be brief."))
+    cache_module._cache_namespace.cache_clear()
+    assert cache_module.get_cached_output("string", "unique test prompt", str) is None
+
+    monkeypatch.setitem(cache_module.AGENT_SPECS, "string", ("google-gla:other-model", output_type, system_prompt))
+    cache_module._cache_namespace.cache_clear()
+    assert cache_module.get_cached_output("string", "unique test prompt", str) is None
+    cache_module._cache_namespace.cache_clear()
@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from models import FinalVeoPrompt
+
+
+def make_prompt(sounds):
+    return FinalVeoPrompt(
+        main_character_description="Bigfoot, a tall figure covered in matted brown fur",
+        scene_setting_description="A snowy pine forest at dawn",
+        atmosphere_and_mood="Calm and quiet",
+        core_action_and_dialogue="Bigfoot waves at the camera and says: 'Morning, everyone.'",
+        camera_style="Handheld vlog camera",
+        sounds=sounds,
+        landscape_notes="Fresh snow on the ground",
+        props=["backpack"],
+    )
+
+
+def test_wall_clock_times_are_not_timelines():
+    prompt = make_prompt(["church bells ringing at 12:00", "radio announcing the 9:30 news"])
+    assert prompt.sounds[0] == "church bells ringing at 12:00"
+
+
+@pytest.mark.parametrize("sound", ["footsteps crunching 0:05-0:08", "twig snaps at 0:07", "wind gust (0:03)"])
+def test_timelines_within_the_video_pass(sound):
+    assert make_prompt([sound]).sounds == [sound]
+
+
+@pytest.mark.parametrize("sound", ["footsteps crunching 0:05-0:12", "twig snaps at 0:09", "wind gust (0:10)"])
+def test_timelines_past_the_video_are_rejected(sound):
+    with pytest.raises(ValidationError):
+        make_prompt([sound])
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from pydantic_ai import Agent
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+import agents.orchestrator as orchestrator_module
+from agents.orchestrator import Orchestrator
+from models import FinalVeoPrompt
+from session_manager import SessionManager
+
+PROMPT_FIELDS = {
+    "main_character_description": "Bigfoot, a tall figure covered in matted brown fur",
+    "scene_setting_description": "A snowy pine forest at dawn",
+    "atmosphere_and_mood": "Calm and quiet",
+    "core_action_and_dialogue": "Bigfoot waves at the camera and says: 'Morning, everyone.'",
+    "camera_style": "Handheld vlog camera",
+    "sounds": ["twig snaps at 0:03"],
+    "landscape_notes": "Fresh snow on the ground",
+    "props": ["backpack"],
+}
+
+
+def chunked_tool_call_agent(output_fields):
+    """Build an agent whose model streams the output tool call's JSON arguments in small pieces."""
+    args_json = json.dumps(output_fields)
+
+    async def stream_function(messages, info):
+        tool_name = info.output_tools[0].name
+        for start in range(0, len(args_json), 20):
+            yield {0: DeltaToolCall(name=tool_name if start == 0 else None, json_args=args_json[start:start + 20])}
+
+    return Agent(FunctionModel(stream_function=stream_function), output_type=FinalVeoPrompt)
+
+
+def collect_stream(monkeypatch, output_fields, inputs):
+    monkeypatch.setattr(orchestrator_module, "get_agent", lambda name: chunked_tool_call_agent(output_fields))
+    orchestrator = Orchestrator(SessionManager())
+
+    async def collect():
+        return [prompt async for prompt in orchestrator.stream_user_input(inputs)]
+
+    return asyncio.run(collect())
+
+
+def test_stream_skips_incomplete_partials(monkeypatch):
+    prompts = collect_stream(monkeypatch, PROMPT_FIELDS, {"character": "Bigfoot", "scene": "streamed forest"})
+
+    assert prompts
+    assert prompts[-1] == FinalVeoPrompt(**PROMPT_FIELDS)
+
+
+def test_stream_falls_back_when_the_output_is_invalid(monkeypatch):
+    # The clip is 8 seconds long, so the streamed output fails validation once complete
+    invalid_fields = {**PROMPT_FIELDS, "sounds": ["thunder 0:05-0:12"]}
+
+    prompts = collect_stream(monkeypatch, invalid_fields, {"character": "Yeti", "scene": "stormy ridge"})
+
+    assert prompts[-1].main_character_description == "Yeti"
+    assert prompts[-1].camera_style == "POV, selfie stick, handheld and natural"
+
+
+def test_stall_timeout_closes_the_stream_when_stopped_early():
+    closed = []
+
+    async def model_stream():
+        try:
+            yield "first"
+            yield "second"
+        finally:
+            closed.append(True)
+
+    async def consume():
+        stream = orchestrator_module._with_stall_timeout(model_stream(), 1)
+        assert await anext(stream) == "first"
+        await stream.aclose()
+        # Closed right away, not only when the event loop shuts down
+        return list(closed)
+
+    assert asyncio.run(consume()) == [True]
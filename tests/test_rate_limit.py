@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.rate_limit import RateLimiter
+
+
+def test_slots_are_spaced_by_the_interval(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", lambda: 100.0)
+    limiter = RateLimiter(requests_per_minute=30)
+
+    assert [limiter._reserve() for _ in range(3)] == [0.0, 2.0, 4.0]
+
+
+def test_an_idle_limiter_does_not_bank_slots(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(requests_per_minute=60)
+    limiter._reserve()
+
+    now[0] = 200.0
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == pytest.approx(1.0)
+
+
+def test_zero_disables_limiting():
+    limiter = RateLimiter(requests_per_minute=0)
+
+    assert [limiter._reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_acquire_sleeps_until_the_reserved_slot(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", lambda: 100.0)
+    delays = []
+
+    async def record_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+    limiter = RateLimiter(requests_per_minute=120)
+
+    async def acquire_three():
+        for _ in range(3):
+            await limiter.acquire()
+
+    asyncio.run(acquire_three())
+    assert delays == [0.5, 1.0]
@@ -1,13 +1,32 @@
+import logging
+import logging.handlers
+import queue
+import re
 import streamlit as st
 from session_manager import SessionManager
 from agents.orchestrator import Orchestrator
-from models import FinalVeoPrompt, MultiScenePrompt, VideoScene
-from jinja2 import Environment, FileSystemLoader
 from config import Config
 
 # Set page config to wide mode
 st.set_page_config(layout="wide")
 
+# Splits the multi-scene output in front of each video's heading
+VIDEO_SECTION_SPLIT = re.compile(r"^(?=## VIDEO )", re.MULTILINE)
+
+@st.cache_resource
+def configure_logging() -> logging.handlers.QueueListener:
+    """Route agent logs through a queue so log writes never block generation tasks."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    agents_logger = logging.getLogger("agents")
+    agents_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    agents_logger.setLevel(logging.INFO)
+    agents_logger.propagate = False
+    listener.start()
+    return listener
+
+configure_logging()
+
 st.title("VeoPrompt-Pro: Multi-Scene Vlog Generator")
 st.markdown("*Create multiple 8-second scenes for up to 40-second professional vlogs*")
 
@@ -16,6 +35,9 @@ google_key = Config.get_google_api_key()
 anthropic_key = Config.get_anthropic_api_key()
 openai_key = Config.get_openai_api_key()
 
+# Warn about missing keys once at application startup (cached, so reruns don't repeat it)
+Config.validate_api_keys()
+
 # Display API key status in a more compact way
 api_col1, api_col2, api_col3 = st.columns(3)
 with api_col1:
@@ -43,49 +65,97 @@ if 'session_manager' not in st.session_state:
     st.session_state['session_manager'] = SessionManager()
 if 'orchestrator' not in st.session_state:
     st.session_state['orchestrator'] = Orchestrator(st.session_state['session_manager'])
-if 'video_scenes' not in st.session_state:
-    st.session_state['video_scenes'] = [{}]  # Start with one empty scene
+if 'scene_count' not in st.session_state:
+    st.session_state['scene_count'] = 1  # Start with one empty scene
+if 'open_scene' not in st.session_state:
+    st.session_state['open_scene'] = 1  # Only this scene's input widgets are rendered
 if 'generated_prompts' not in st.session_state:
     st.session_state['generated_prompts'] = None
 
-# Helper function to create scene input fields
-def create_scene_input(scene_num, scene_data):
-    """Create input fields for a single video scene"""
+# Input fields of a video scene; each widget keeps its value in st.session_state under f"{field}_{scene_num}"
+SCENE_FIELDS = ('character', 'scene_setting', 'action_dialogue', 'camera_style', 'sounds', 'landscape', 'props')
+
+def scene_values(scene_num):
+    """Read a scene's entered values from the widget state"""
+    return {field: st.session_state.get(f"{field}_{scene_num}", '') for field in SCENE_FIELDS}
 
-    with st.expander(f"🎬 Video {scene_num} (8 seconds)", expanded=scene_num == 1):
+def scenes_have_content():
+    """Check if at least one scene has character info"""
+    return any(
+        st.session_state.get(f"character_{scene_num}", '').strip()
+        for scene_num in range(1, st.session_state['scene_count'] + 1)
+    )
+
+def delete_scene(scene_num):
+    """Remove a scene by shifting the widget values of every later scene down by one"""
+    last_scene = st.session_state['scene_count']
+    for num in range(scene_num, last_scene):
+        for field in SCENE_FIELDS:
+            st.session_state[f"{field}_{num}"] = st.session_state.get(f"{field}_{num + 1}", '')
+    for field in SCENE_FIELDS:
+        st.session_state.pop(f"{field}_{last_scene}", None)
+    st.session_state['scene_count'] = last_scene - 1
+    st.session_state['open_scene'] = min(st.session_state['open_scene'], last_scene - 1)
+
+def add_scene():
+    """Append an empty scene and open it"""
+    st.session_state['scene_count'] += 1
+    st.session_state['open_scene'] = st.session_state['scene_count']
+
+def open_scene(scene_num):
+    """Switch which scene's input widgets are rendered"""
+    st.session_state['open_scene'] = scene_num
+
+# Deletions requested in the previous run are applied before any scene widget exists,
+# since widget values can't be changed once the widget has been created in a run
+if 'pending_delete' in st.session_state:
+    delete_scene(st.session_state.pop('pending_delete'))
+
+# Streamlit drops the state of widgets that are not rendered in a run; re-assigning the values of the
+# collapsed scenes keeps what the user entered there
+for scene_num in range(1, st.session_state['scene_count'] + 1):
+    if scene_num != st.session_state['open_scene']:
+        for field in SCENE_FIELDS:
+            key = f"{field}_{scene_num}"
+            if key in st.session_state:
+                st.session_state[key] = st.session_state[key]
+
+# Helper function to create scene input fields; as a fragment, typing in one scene only reruns that scene
+@st.fragment
+def create_scene_input(index):
+    """Create input fields for a single video scene; the values live in the widgets' session state"""
+    scene_num = index + 1
+
+    with st.expander(f"🎬 Video {scene_num} (8 seconds)", expanded=True):
         col1, col2 = st.columns(2)
 
         with col1:
-            character = st.text_area(
+            st.text_area(
                 f"🎭 Character - Video {scene_num}",
-                value=scene_data.get('character', ''),
                 placeholder="e.g., 'Bigfoot', 'A friendly Yeti', 'Outdoor enthusiast'",
                 height=80,
                 key=f"character_{scene_num}",
                 help="Main character(s) for this scene"
             )
 
-            scene_setting = st.text_area(
+            st.text_area(
                 f"🏞️ Scene Setting - Video {scene_num}",
-                value=scene_data.get('scene_setting', ''),
                 placeholder="e.g., 'Snowy mountain landscape', 'Dense forest clearing'",
                 height=80,
                 key=f"scene_setting_{scene_num}",
                 help="Location and environment for this scene"
             )
 
-            action_dialogue = st.text_area(
+            st.text_area(
                 f"💬 Action & Dialogue - Video {scene_num}",
-                value=scene_data.get('action_dialogue', ''),
                 placeholder="e.g., 'Building snow sandwiches and laughing together'",
                 height=80,
                 key=f"action_dialogue_{scene_num}",
                 help="What happens in this 8-second scene"
             )
 
-            camera_style = st.text_area(
+            st.text_area(
                 f"📹 Camera Style - Video {scene_num}",
-                value=scene_data.get('camera_style', ''),
                 placeholder="e.g., 'POV selfie stick, handheld, close-up shots'",
                 height=70,
                 key=f"camera_style_{scene_num}",
@@ -93,27 +163,24 @@ def create_scene_input(scene_num, scene_data):
             )
 
         with col2:
-            sounds = st.text_area(
+            st.text_area(
                 f"🔊 Sounds - Video {scene_num}",
-                value=scene_data.get('sounds', ''),
                 placeholder="e.g., 'Crunching snow, laughter, mountain echoes'",
                 height=80,
                 key=f"sounds_{scene_num}",
                 help="Audio elements for this scene"
             )
 
-            landscape = st.text_area(
+            st.text_area(
                 f"🌲 Landscape - Video {scene_num}",
-                value=scene_data.get('landscape', ''),
                 placeholder="e.g., 'Snow-covered pine trees, rugged mountains'",
                 height=80,
                 key=f"landscape_{scene_num}",
                 help="Environmental details"
             )
 
-            props = st.text_area(
+            st.text_area(
                 f"🎯 Props - Video {scene_num}",
-                value=scene_data.get('props', ''),
                 placeholder="e.g., 'Pinecones, icicles, snowballs'",
                 height=80,
                 key=f"props_{scene_num}",
@@ -121,19 +188,15 @@ def create_scene_input(scene_num, scene_data):
             )
 
         # Delete button (only show if more than 1 scene)
-        if len(st.session_state['video_scenes']) > 1:
+        if st.session_state['scene_count'] > 1:
+            # The click only reruns this fragment; the scene list changes, so that run hands over to one full rerun
             if st.button(f"🗑️ Delete Video {scene_num}", key=f"delete_{scene_num}", type="secondary"):
-                return "DELETE"
-
-    return {
-        'character': character,
-        'scene_setting': scene_setting,
-        'action_dialogue': action_dialogue,
-        'camera_style': camera_style,
-        'sounds': sounds,
-        'landscape': landscape,
-        'props': props
-    }
+                st.session_state['pending_delete'] = scene_num
+                st.rerun()
+
+    # The generate button outside this fragment is enabled by character info, so refresh the page when that flips
+    if scenes_have_content() != st.session_state['scenes_had_content']:
+        st.rerun()
 
 # Main layout
 st.markdown("---")
@@ -142,94 +205,98 @@ st.markdown("---")
 button_col1, button_col2, button_col3 = st.columns([1, 1, 2])
 
 with button_col1:
-    if st.button("➕ Add Video Scene", type="secondary", disabled=len(st.session_state['video_scenes']) >= 5):
-        st.session_state['video_scenes'].append({})
-        st.rerun()
+    # The callback runs before the rerun the click triggers, so no second st.rerun() is needed
+    st.button("➕ Add Video Scene", type="secondary", disabled=st.session_state['scene_count'] >= 5, on_click=add_scene)
 
 with button_col2:
-    st.markdown(f"**Total Duration:** {len(st.session_state['video_scenes']) * 8} seconds")
+    st.markdown(f"**Total Duration:** {st.session_state['scene_count'] * 8} seconds")
 
 with button_col3:
-    if len(st.session_state['video_scenes']) >= 5:
+    if st.session_state['scene_count'] >= 5:
         st.info("Maximum 5 scenes (40 seconds) reached")
 
-# Create input fields for all scenes
-scenes_to_delete = []
-updated_scenes = []
-
-for i, scene_data in enumerate(st.session_state['video_scenes']):
+# Create input fields for the open scene only; the others get a one-line stub that opens them
+st.session_state['scenes_had_content'] = scenes_have_content()
+for i in range(st.session_state['scene_count']):
     scene_num = i + 1
-    result = create_scene_input(scene_num, scene_data)
-
-    if result == "DELETE":
-        scenes_to_delete.append(i)
+    if scene_num == st.session_state['open_scene']:
+        create_scene_input(i)
     else:
-        updated_scenes.append(result)
-
-# Handle deletions
-if scenes_to_delete:
-    for idx in reversed(scenes_to_delete):  # Delete from end to avoid index issues
-        del st.session_state['video_scenes'][idx]
-    st.rerun()
-else:
-    st.session_state['video_scenes'] = updated_scenes
+        character_preview = st.session_state.get(f"character_{scene_num}", '').strip() or "empty"
+        st.button(
+            f"🎬 Video {scene_num} (8 seconds): {character_preview}",
+            key=f"open_scene_{scene_num}",
+            on_click=open_scene,
+            args=(scene_num,),
+            use_container_width=True
+        )
 
 # Generate button and consistency settings
 st.markdown("---")
 
-col1, col2 = st.columns([1, 1])
+# Story fields are submitted together with the generate button instead of rerunning the page on each edit
+with st.form("story_form", border=False):
+    col1, col2 = st.columns([1, 1])
 
-with col1:
-    st.subheader("🎯 Story Consistency")
+    with col1:
+        st.subheader("🎯 Story Consistency")
 
-    overall_story = st.text_area(
-        "📖 Overall Story/Theme",
-        placeholder="e.g., 'Bigfoot and Yeti having winter outdoor adventures'",
-        height=80,
-        help="Common theme that connects all video scenes"
-    )
+        overall_story = st.text_area(
+            "📖 Overall Story/Theme",
+            placeholder="e.g., 'Bigfoot and Yeti having winter outdoor adventures'",
+            height=80,
+            help="Common theme that connects all video scenes"
+        )
 
-    main_characters = st.text_input(
-        "👥 Main Characters (consistent across scenes)",
-        placeholder="e.g., 'Bigfoot, Yeti'",
-        help="Characters that appear throughout the video series"
-    )
+        main_characters = st.text_input(
+            "👥 Main Characters (consistent across scenes)",
+            placeholder="e.g., 'Bigfoot, Yeti'",
+            help="Characters that appear throughout the video series"
+        )
 
-with col2:
-    st.subheader("🚀 Generate Multi-Scene Prompts")
+    with col2:
+        st.subheader("🚀 Generate Multi-Scene Prompts")
 
-    # Check if at least one scene has character info
-    has_content = any(scene.get('character', '').strip() for scene in st.session_state['video_scenes'])
+        has_content = scenes_have_content()
 
-    if not has_content:
-        st.info("💡 Add character info to at least one scene to get started!")
-    else:
-        st.success(f"✅ Ready to generate {len(st.session_state['video_scenes'])} video scenes!")
+        if not has_content:
+            st.info("💡 Add character info to at least one scene to get started!")
+        else:
+            st.success(f"✅ Ready to generate {st.session_state['scene_count']} video scenes!")
 
-    generate_button = st.button(
-        f"🚀 Generate {len(st.session_state['video_scenes'])} Professional Prompts",
-        type="primary",
-        use_container_width=True,
-        disabled=not has_content
-    )
+        generate_button = st.form_submit_button(
+            f"🚀 Generate {st.session_state['scene_count']} Professional Prompts",
+            type="primary",
+            use_container_width=True,
+            disabled=not has_content
+        )
 
 # Process inputs when generate button is clicked
 if generate_button:
-    with st.spinner(f"🎬 Creating {len(st.session_state['video_scenes'])} professional video prompts..."):
+    with st.spinner(f"🎬 Creating {st.session_state['scene_count']} professional video prompts..."):
         try:
             # Create multi-scene data
             multi_scene_data = {
                 'overall_story': overall_story.strip(),
                 'main_characters': main_characters.strip(),
-                'video_scenes': st.session_state['video_scenes']
+                'video_scenes': [scene_values(scene_num) for scene_num in range(1, st.session_state['scene_count'] + 1)]
             }
 
-            # Process through the orchestrator
-            multi_scene_prompts = st.session_state['orchestrator'].process_multi_scene_input(multi_scene_data)
+            if Config.MULTI_SCENE_SINGLE_REQUEST:
+                # All scenes in one LLM request
+                multi_scene_prompts = st.session_state['orchestrator'].process_multi_scene_batched(multi_scene_data)
+            else:
+                # Process through the orchestrator, showing each scene as soon as it is generated
+                progress_placeholder = st.empty()
+                multi_scene_prompts = None
+                for multi_scene_prompts in st.session_state['orchestrator'].stream_multi_scene_input(multi_scene_data):
+                    progress_placeholder.markdown(multi_scene_prompts)
+                # The complete output is rendered by the display section below
+                progress_placeholder.empty()
 
             # Store in session state
             st.session_state['generated_prompts'] = multi_scene_prompts
-            st.success(f"✅ {len(st.session_state['video_scenes'])} professional prompts generated!")
+            st.success(f"✅ {st.session_state['scene_count']} professional prompts generated!")
 
         except Exception as e:
             st.error(f"❌ Error generating prompts: {e}")
@@ -239,17 +306,64 @@ if generate_button:
 if st.session_state['generated_prompts']:
     st.markdown("---")
 
-    # Create a row with title and copy button
-    title_col, copy_col = st.columns([3, 1])
-    with title_col:
-        st.markdown("### 🎥 Your Multi-Scene Professional Prompts")
-    with copy_col:
-        if st.button("📋 Copy All Prompts", key="copy_all_button", use_container_width=True):
-            st.code(st.session_state['generated_prompts'], language="markdown")
-            st.success("✅ All prompts copied!")
+    st.markdown("### 🎥 Your Multi-Scene Professional Prompts")
+
+    # Raw by default: multi-scene output is several KB, and a code block skips client-side markdown parsing.
+    # The code block's own copy icon copies all prompts at once
+    view_mode = st.segmented_control("Display", ["Raw", "Formatted"], default="Raw", key="prompt_view_mode")
 
     # Show the prompts in a nice container
     with st.container():
-        st.markdown(st.session_state['generated_prompts'])
+        if view_mode != "Formatted":
+            st.code(st.session_state['generated_prompts'], language="markdown")
+        else:
+            # Only the Raw code block has a copy icon
+            st.caption("📋 Switch to Raw to copy all prompts at once")
+            # One markdown element per video keeps each rendered tree small
+            for section in VIDEO_SECTION_SPLIT.split(st.session_state['generated_prompts']):
+                with st.container():
+                    st.markdown(section)
         st.markdown("---")
-        st.markdown("*💡 Each prompt is optimized for VEO3 and other AI video generation models*")
\ No newline at end of file
+        st.markdown("*💡 Each prompt is optimized for VEO3 and other AI video generation models*")
+
+# Quick single-scene prompt with variations
+st.markdown("---")
+with st.expander("✨ Quick Single Prompt (with variations)"):
+    # All fields are submitted in one rerun when the user clicks generate
+    with st.form("single_prompt_form"):
+        single_col1, single_col2 = st.columns(2)
+        with single_col1:
+            single_character = st.text_input("🎭 Character", placeholder="e.g., 'Bigfoot'", key="single_character")
+            single_scene = st.text_input("🏞️ Scene Setting", placeholder="e.g., 'Snowy mountain campsite'", key="single_scene")
+        with single_col2:
+            single_action = st.text_input("💬 Action & Dialogue", placeholder="e.g., 'Roasting marshmallows'", key="single_action")
+            variation_count = st.number_input("🔀 Variations", min_value=1, max_value=4, value=1, key="variation_count")
+
+        single_generate = st.form_submit_button("✨ Generate Single Prompt")
+
+    if single_generate and not single_character.strip():
+        st.info("💡 Add a character to generate a prompt!")
+    elif single_generate:
+        with st.spinner(f"🎬 Creating {variation_count} prompt variation(s)..."):
+            try:
+                single_inputs = {
+                    'character': single_character.strip(),
+                    'scene': single_scene.strip(),
+                    'action': single_action.strip()
+                }
+                # Variations are generated concurrently rather than one after another
+                final_prompts = st.session_state['orchestrator'].process_user_input_variations(
+                    single_inputs, int(variation_count)
+                )
+                st.session_state['single_prompts'] = [
+                    st.session_state['orchestrator'].render_prompt(final_prompt) for final_prompt in final_prompts
+                ]
+            except Exception as e:
+                st.error(f"❌ Error generating prompt: {e}")
+
+    # Prompts are stored already rendered, so reruns only redisplay the markdown
+    if st.session_state.get('single_prompts'):
+        variation_tabs = st.tabs([f"Variation {i + 1}" for i in range(len(st.session_state['single_prompts']))])
+        for tab, prompt_md in zip(variation_tabs, st.session_state['single_prompts']):
+            with tab:
+                st.markdown(prompt_md)